@@ -1,40 +1,118 @@
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, session, jsonify, Response
 import sqlite3
 from datetime import datetime, timedelta
+from markupsafe import escape
 from werkzeug.security import generate_password_hash, check_password_hash
 
-# EMAIL IMPORTS
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email_config import EMAIL_ADDRESS, EMAIL_PASSWORD
 
+# Mail modules (smtplib, email.mime, email_config) are imported inside
+# send_confirmation_email so they only load when the first email goes out.
+DEFAULT_CONFIG = {
+    "ROOMS_DB": "rooms.db",
+    "STAFF_DB": "staff.db",
+    "SECRET_KEY": "change_this_super_secret_key",
+    "PERMANENT_SESSION_LIFETIME": timedelta(minutes=20),
+    "EMAIL_ADDRESS": None,
+    "EMAIL_PASSWORD": None,
+    # False skips all outgoing mail (used by check_query_plans.py)
+    "MAIL_ENABLED": True,
+    # Optional callable passed to sqlite3 set_trace_callback on every
+    # rooms.db connection
+    "SQL_TRACE": None,
+    # Serve hot reads from an in-memory copy of rooms.db (see read_mirror.py)
+    "READ_MIRROR": False,
+}
+
+# Staff room blocks are stored as bookings under this address so every
+# existing conflict check treats the blocked period as taken.
+BLOCK_EMAIL = "room-blocked@staff"
+
+bp = Blueprint("main", __name__)
+
+
+# APP FACTORY
+def create_app(config=None):
+    """
+    Build a configured app instance. `config` is a dict that overrides
+    DEFAULT_CONFIG (e.g. {"ROOMS_DB": "/data/rooms.db"}).
+    """
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    if config:
+        app.config.update(config)
 
-app = Flask(__name__)
+    app.register_blueprint(bp)
 
-ROOMS_DB = "rooms.db"
-STAFF_DB = "staff.db"
+    if app.config["READ_MIRROR"]:
+        from read_mirror import ReadMirror
+        mirror = ReadMirror(app.config["ROOMS_DB"])
+        mirror.load()
+        app.extensions["read_mirror"] = mirror
 
-app.secret_key = "change_this_super_secret_key"
-app.permanent_session_lifetime = timedelta(minutes=20)
+    return app
 
 
 # DB HELPERS
 def get_db():
-    conn = sqlite3.connect(ROOMS_DB)
+    conn = sqlite3.connect(current_app.config["ROOMS_DB"])
     conn.row_factory = sqlite3.Row
+    if current_app.config["SQL_TRACE"]:
+        conn.set_trace_callback(current_app.config["SQL_TRACE"])
     return conn
 
 
+def get_read_db(date=None):
+    """
+    Connection for read-only queries. Uses the in-memory mirror when it is
+    enabled and holds `date` (default: today and later), otherwise rooms.db.
+    """
+    mirror = current_app.extensions.get("read_mirror")
+    if mirror and (date is None or mirror.covers(date)):
+        return mirror.connect()
+    return get_db()
+
+
+def sync_mirror(room_id=None, start_date=None, end_date=None, rooms=False):
+    """
+    Called by write paths right after commit: refresh the mirrored rooms
+    table and/or one room's bookings between two dates.
+    """
+    mirror = current_app.extensions.get("read_mirror")
+    if not mirror:
+        return
+    if rooms:
+        mirror.refresh_rooms()
+    if room_id is not None:
+        mirror.refresh_bookings(room_id, start_date, end_date)
+
+
 def get_staff_db():
-    conn = sqlite3.connect(STAFF_DB)
+    conn = sqlite3.connect(current_app.config["STAFF_DB"])
     conn.row_factory = sqlite3.Row
     return conn
 
 
 
 # EMAIL SENDER
+def mail_credentials():
+    email_address = current_app.config["EMAIL_ADDRESS"]
+    email_password = current_app.config["EMAIL_PASSWORD"]
+    if email_address is None:
+        from email_config import EMAIL_ADDRESS, EMAIL_PASSWORD
+        email_address, email_password = EMAIL_ADDRESS, EMAIL_PASSWORD
+    return email_address, email_password
+
+
 def send_confirmation_email(to_email, room_number, date, start, end):
+    if not current_app.config["MAIL_ENABLED"]:
+        return
+
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
+    email_address, email_password = mail_credentials()
+
     subject = "Your Study Room Booking Confirmation"
 
     html_body = f"""
@@ -72,7 +150,7 @@ def send_confirmation_email(to_email, room_number, date, start, end):
     """
 
     msg = MIMEMultipart("alternative")
-    msg["From"] = EMAIL_ADDRESS
+    msg["From"] = email_address
     msg["To"] = to_email
     msg["Subject"] = subject
     msg.attach(MIMEText(html_body, "html"))
@@ -80,7 +158,7 @@ def send_confirmation_email(to_email, room_number, date, start, end):
     try:
         server = smtplib.SMTP("smtp.gmail.com", 587)
         server.starttls()
-        server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+        server.login(email_address, email_password)
         server.send_message(msg)
         server.quit()
         print("Confirmation email sent successfully.")
@@ -89,6 +167,73 @@ def send_confirmation_email(to_email, room_number, date, start, end):
 
 
 
+def send_cancellation_emails(notices, email_address, email_password):
+    """
+    Send one email per user listing all their cancelled bookings, over a
+    single SMTP session. `notices` is a list of dicts with email,
+    room_number, date, start_time and end_time.
+    """
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
+    by_user = {}
+    for n in notices:
+        by_user.setdefault(n["email"], []).append(n)
+
+    try:
+        server = smtplib.SMTP("smtp.gmail.com", 587)
+        server.starttls()
+        server.login(email_address, email_password)
+
+        for to_email, items in by_user.items():
+            rows = "".join(
+                f"<li>Room {n['room_number']}, {n['date']}, "
+                f"{n['start_time']} → {n['end_time']}</li>"
+                for n in items
+            )
+            msg = MIMEMultipart("alternative")
+            msg["From"] = email_address
+            msg["To"] = to_email
+            msg["Subject"] = "Your Study Room Booking Was Cancelled"
+            msg.attach(MIMEText(f"""
+            <html>
+            <body style="font-family: Arial, sans-serif; color:#333;">
+                <p>Hello,</p>
+                <p>The following bookings were cancelled by staff:</p>
+                <ul>{rows}</ul>
+                <p>We apologize for the inconvenience.</p>
+            </body>
+            </html>
+            """, "html"))
+            server.send_message(msg)
+
+        server.quit()
+        print(f"Cancellation emails sent to {len(by_user)} users.")
+    except Exception as e:
+        print("Cancellation email batch failed:", e)
+
+
+def queue_cancellation_emails(notices):
+    """
+    Hand a batch of cancellation notices to a background thread so the
+    staff request returns as soon as the transaction commits.
+    """
+    import threading
+
+    notices = [n for n in notices if n["email"] != BLOCK_EMAIL]
+    if not notices or not current_app.config["MAIL_ENABLED"]:
+        return
+
+    email_address, email_password = mail_credentials()
+    threading.Thread(
+        target=send_cancellation_emails,
+        args=(notices, email_address, email_password),
+        daemon=True
+    ).start()
+
+
+
 # TIME FORMATTER
 def to_12h(time_str):
     """
@@ -110,31 +255,32 @@ def staff_required():
 
 
 # HOME PAGE
-@app.route("/")
+@bp.route("/")
 def home():
     return render_template("index.html")
 
 
 # ROOMS LIST
-@app.route("/rooms")
+@bp.route("/rooms")
 def rooms():
-    conn = get_db()
-    rooms = conn.execute("SELECT * FROM rooms").fetchall()
-
     today = datetime.now().strftime("%Y-%m-%d")
     now = datetime.now().strftime("%H:%M")
 
+    # One statement: each room with the end of its current booking, if any
+    conn = get_read_db()
+    rooms = conn.execute("""
+        SELECT rooms.*,
+               (SELECT end_time
+                FROM bookings
+                WHERE room_id=rooms.id AND date=? AND start_time <= ? AND end_time > ?
+                LIMIT 1) AS active_end
+        FROM rooms
+    """, (today, now, now)).fetchall()
+
     room_list = []
     for room in rooms:
-        active = conn.execute("""
-            SELECT end_time
-            FROM bookings
-            WHERE room_id=? AND date=? AND start_time <= ? AND end_time > ?
-            LIMIT 1
-        """, (room["id"], today, now, now)).fetchone()
-
-        if active:
-            status = f"Occupied until {to_12h(active['end_time'])}"
+        if room["active_end"]:
+            status = f"Occupied until {to_12h(room['active_end'])}"
         else:
             status = "Available"
 
@@ -152,9 +298,9 @@ def rooms():
 
 
 # ROOM DETAILS + REAL-TIME STATUS
-@app.route("/room/<int:id>")
+@bp.route("/room/<int:id>")
 def room_details(id):
-    conn = get_db()
+    conn = get_read_db()
     room = conn.execute("SELECT * FROM rooms WHERE id=?", (id,)).fetchone()
     today = datetime.now().strftime("%Y-%m-%d")
     now = datetime.now().strftime("%H:%M")
@@ -197,17 +343,147 @@ def room_details(id):
 
 
 
+# MULTI-DAY SCHEDULE
+MAX_SCHEDULE_DAYS = 31
+
+
+def build_schedule(rows, room_ids, days):
+    """
+    Group bookings ordered by room, date and start time into per-room,
+    per-day block lists in one pass, with free gaps between them.
+    Returns {(room_id, date): [block, ...]}.
+    """
+    schedule = {(room_id, day): [] for room_id in room_ids for day in days}
+    last_end = {}
+
+    for b in rows:
+        key = (b["room_id"], b["date"])
+        blocks = schedule[key]
+        prev = last_end.get(key, "00:00")
+        if b["start_time"] > prev:
+            blocks.append({"start": to_12h(prev), "end": to_12h(b["start_time"]), "kind": "free"})
+        blocks.append({
+            "start": to_12h(b["start_time"]),
+            "end": to_12h(b["end_time"]),
+            "kind": "blocked" if b["blocked"] else "booked"
+        })
+        last_end[key] = max(prev, b["end_time"])
+
+    for key, blocks in schedule.items():
+        prev = last_end.get(key, "00:00")
+        if prev < "24:00":
+            blocks.append({"start": to_12h(prev), "end": to_12h("24:00"), "kind": "free"})
+
+    return schedule
+
+
+@bp.route("/schedule")
+def schedule_view():
+    today = datetime.now().date()
+    try:
+        start = datetime.strptime(request.args.get("start", ""), "%Y-%m-%d").date()
+    except ValueError:
+        start = today
+    try:
+        end = datetime.strptime(request.args.get("end", ""), "%Y-%m-%d").date()
+    except ValueError:
+        end = start + timedelta(days=6)
+
+    if end < start:
+        end = start
+    end = min(end, start + timedelta(days=MAX_SCHEDULE_DAYS - 1))
+
+    days = [(start + timedelta(days=i)).strftime("%Y-%m-%d")
+            for i in range((end - start).days + 1)]
+
+    conn = get_read_db(days[0])
+    all_rooms = conn.execute("SELECT * FROM rooms ORDER BY room_number").fetchall()
+    selected = {int(r) for r in request.args.getlist("rooms") if r.isdigit()}
+    rooms = [r for r in all_rooms if r["id"] in selected] or all_rooms
+    room_ids = [r["id"] for r in rooms]
+
+    # One range query for every room and day in view
+    rows = []
+    if room_ids:
+        placeholders = ", ".join("?" for _ in room_ids)
+        rows = conn.execute(f"""
+            SELECT room_id, date, start_time, end_time, email = ? AS blocked
+            FROM bookings
+            WHERE room_id IN ({placeholders}) AND date BETWEEN ? AND ?
+            ORDER BY room_id, date, start_time
+        """, [BLOCK_EMAIL] + room_ids + [days[0], days[-1]]).fetchall()
+    conn.close()
+
+    schedule = build_schedule(rows, room_ids, days)
+
+    return render_template(
+        "schedule.html",
+        all_rooms=all_rooms,
+        rooms=rooms,
+        selected=selected,
+        days=[{"date": d, "weekday": datetime.strptime(d, "%Y-%m-%d").strftime("%a")} for d in days],
+        schedule=schedule,
+        start=days[0],
+        end=days[-1]
+    )
+
+
+
 # BOOK ROOM
-@app.route("/book")
+@bp.route("/book")
 def book():
     room_id = request.args.get("room_id")
-    conn = get_db()
+    conn = get_read_db()
     rooms = conn.execute("SELECT * FROM rooms").fetchall()
     conn.close()
     return render_template("booking.html", rooms=rooms, preselected=room_id)
 
 
-@app.route("/submit-booking", methods=["POST"])
+MAX_BOOKING_HOURS = 6
+
+
+def to_minutes(time_str):
+    """
+    'HH:MM' -> minutes since midnight, or None if malformed. '24:00' is
+    allowed as the end of the day.
+    """
+    try:
+        h, m = time_str.split(":")
+        h, m = int(h), int(m)
+    except (AttributeError, ValueError):
+        return None
+    if not (0 <= m < 60 and (0 <= h < 24 or (h == 24 and m == 0))):
+        return None
+    return h * 60 + m
+
+
+def validate_booking(room_id, date, start, end):
+    """
+    Shared checks for anything that creates a booking (direct or through
+    the waitlist). Returns (error message or None, length in minutes).
+    """
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return "Invalid date.", 0
+
+    start_min = to_minutes(start)
+    end_min = to_minutes(end)
+    if start_min is None or end_min is None:
+        return "Invalid time range.", 0
+    if end_min <= start_min:
+        return "End time must be after start time.", 0
+    if end_min - start_min > MAX_BOOKING_HOURS * 60:
+        return f"You cannot book more than {MAX_BOOKING_HOURS} hours.", 0
+
+    room = get_read_db().execute("SELECT 1 FROM rooms WHERE id=?", (room_id,)).fetchone()
+    if not room:
+        return "Unknown room.", 0
+
+    return None, end_min - start_min
+
+
+@bp.route("/submit-booking", methods=["POST"])
 def submit_booking():
     email = request.form["email"]
     room_id = request.form["room"]
@@ -215,57 +491,37 @@ def submit_booking():
     start = request.form["start"]
     end = request.form["end"]
 
-    if end <= start:
-        return render_template(
-            "booking.html",
-            rooms=get_db().execute("SELECT * FROM rooms").fetchall(),
-            message="End time must be after start time."
-        )
-
-    start_dt = datetime.strptime(start, "%H:%M")
-    end_dt = datetime.strptime(end, "%H:%M")
-    hours = (end_dt - start_dt).total_seconds() / 3600
-
-    if hours <= 0:
+    error, minutes = validate_booking(room_id, date, start, end)
+    if error:
         return render_template(
             "booking.html",
-            rooms=get_db().execute("SELECT * FROM rooms").fetchall(),
-            message="Invalid time range."
+            rooms=get_read_db().execute("SELECT * FROM rooms").fetchall(),
+            message=error
         )
 
-    if hours > 6:
-        return render_template(
-            "booking.html",
-            rooms=get_db().execute("SELECT * FROM rooms").fetchall(),
-            message="You cannot book more than 6 hours."
-        )
+    read = get_read_db(date)
 
-    conn = get_db()
-
-    conflict = conn.execute("""
+    conflict = read.execute("""
         SELECT *
         FROM bookings
         WHERE room_id=? AND date=? AND NOT (end_time <= ? OR start_time >= ?)
     """, (room_id, date, start, end)).fetchone()
 
     if conflict:
-        day_bookings = conn.execute("""
+        day_bookings = read.execute("""
             SELECT start_time, end_time
             FROM bookings
             WHERE room_id=? AND date=?
             ORDER BY start_time
         """, (room_id, date)).fetchall()
+        read.close()
 
-        def to_min(t):
-            h, m = map(int, t.split(":"))
-            return h * 60 + m
-
-        req_min = int(hours * 60)
-        start_min = to_min(start)
+        req_min = minutes
+        start_min = to_minutes(start)
 
         for b in day_bookings:
-            b_start = to_min(b["start_time"])
-            b_end = to_min(b["end_time"])
+            b_start = to_minutes(b["start_time"])
+            b_end = to_minutes(b["end_time"])
 
             if start_min + req_min <= b_start:
                 suggested_start = start_min
@@ -287,20 +543,32 @@ def submit_booking():
             <p>This room is booked during that time.</p>
             <p>Next available slot:</p>
             <strong>{to_12h(fmt(suggested_start))} → {to_12h(fmt(suggested_end))}</strong>
+            <form method="POST" action="/waitlist/join" style="margin-top:10px;">
+                <input type="hidden" name="email" value="{escape(email)}">
+                <input type="hidden" name="room" value="{escape(room_id)}">
+                <input type="hidden" name="date" value="{escape(date)}">
+                <input type="hidden" name="start" value="{escape(start)}">
+                <input type="hidden" name="end" value="{escape(end)}">
+                <button type="submit">Join the waitlist for this time</button>
+            </form>
         """
 
         return render_template(
             "booking.html",
-            rooms=get_db().execute("SELECT * FROM rooms").fetchall(),
+            rooms=get_read_db().execute("SELECT * FROM rooms").fetchall(),
             message=msg
         )
 
+    read.close()
+
     # INSERT BOOKING
+    conn = get_db()
     conn.execute("""
         INSERT INTO bookings (email, room_id, date, start_time, end_time)
         VALUES (?, ?, ?, ?, ?)
     """, (email, room_id, date, start, end))
     conn.commit()
+    sync_mirror(room_id, date, date)
 
     # FETCH ROOM NUMBER FOR EMAIL
     room_row = conn.execute("SELECT room_number FROM rooms WHERE id=?", (room_id,)).fetchone()
@@ -315,12 +583,12 @@ def submit_booking():
         end
     )
 
-    return redirect(url_for("history", msg="success", email=email))
+    return redirect(url_for("main.history", msg="success", email=email))
 
 
 
 # USER HISTORY + CANCEL OWN
-@app.route("/history")
+@bp.route("/history")
 def history():
     msg = request.args.get("msg")
     email = request.args.get("email")
@@ -336,6 +604,14 @@ def history():
         WHERE email=?
         ORDER BY date DESC, start_time
     """, (email,)).fetchall()
+
+    waiting = conn.execute("""
+        SELECT waitlist.*, rooms.room_number
+        FROM waitlist
+        JOIN rooms ON rooms.id = waitlist.room_id
+        WHERE email=? AND date >= ?
+        ORDER BY date, start_time
+    """, (email, datetime.now().strftime("%Y-%m-%d"))).fetchall()
     conn.close()
 
     bookings = [{
@@ -346,29 +622,230 @@ def history():
         "end_time": to_12h(b["end_time"])
     } for b in rows]
 
+    waitlist = [{
+        "id": w["id"],
+        "room_number": w["room_number"],
+        "date": w["date"],
+        "start_time": to_12h(w["start_time"]),
+        "end_time": to_12h(w["end_time"])
+    } for w in waiting]
+
     return render_template(
         "history.html",
         bookings=bookings,
+        waitlist=waitlist,
         email=email,
         msg=msg
     )
 
 
-@app.route("/cancel/<int:id>")
+@bp.route("/cancel/<int:id>")
 def cancel_booking(id):
+    row, promoted = cancel_and_promote(id)
+    if row:
+        notify_promoted(promoted)
+        return redirect(url_for("main.history", msg="deleted", email=row["email"]))
+    return redirect(url_for("main.history"))
+
+
+
+# WAITLIST
+def promote_waitlist(conn, room_id, date, start, end):
+    """
+    Hand a freed start-end window to the waitlist. Waiters for the same
+    room and date whose window overlaps it are tried in the order they
+    joined, and each one that no longer conflicts is booked and removed
+    from the waitlist. Runs on the caller's transaction and returns the
+    promoted entries.
+    """
+    waiters = conn.execute("""
+        SELECT waitlist.*, rooms.room_number
+        FROM waitlist
+        JOIN rooms ON rooms.id = waitlist.room_id
+        WHERE waitlist.room_id=? AND waitlist.date=?
+          AND waitlist.start_time < ? AND waitlist.end_time > ?
+        ORDER BY waitlist.id
+    """, (room_id, date, end, start)).fetchall()
+
+    if not waiters:
+        return []
+
+    # Check waiters against the day's bookings in memory instead of one
+    # conflict query per waiter
+    taken = [(b["start_time"], b["end_time"]) for b in conn.execute("""
+        SELECT start_time, end_time
+        FROM bookings
+        WHERE room_id=? AND date=?
+    """, (room_id, date))]
+
+    promoted = []
+    for w in waiters:
+        if any(not (b_end <= w["start_time"] or b_start >= w["end_time"])
+               for b_start, b_end in taken):
+            continue
+        taken.append((w["start_time"], w["end_time"]))
+        conn.execute("""
+            INSERT INTO bookings (email, room_id, date, start_time, end_time)
+            VALUES (?, ?, ?, ?, ?)
+        """, (w["email"], room_id, date, w["start_time"], w["end_time"]))
+        conn.execute("DELETE FROM waitlist WHERE id=?", (w["id"],))
+        promoted.append(w)
+
+    return promoted
+
+
+def cancel_and_promote(booking_id):
+    """
+    Delete a booking and promote waiters into the freed time in one
+    transaction. Returns (deleted_row or None, promoted waiters).
+    """
     conn = get_db()
-    row = conn.execute("SELECT email FROM bookings WHERE id=?", (id,)).fetchone()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM bookings WHERE id=?", (booking_id,)).fetchone()
+        promoted = []
+        if row:
+            conn.execute("DELETE FROM bookings WHERE id=?", (booking_id,))
+            promoted = promote_waitlist(
+                conn, row["room_id"], row["date"], row["start_time"], row["end_time"]
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
     if row:
-        email = row["email"]
-        conn.execute("DELETE FROM bookings WHERE id=?", (id,))
+        sync_mirror(row["room_id"], row["date"], row["date"])
+
+    return row, promoted
+
+
+def notify_promoted(promoted):
+    for w in promoted:
+        send_confirmation_email(
+            w["email"],
+            w["room_number"],
+            w["date"],
+            w["start_time"],
+            w["end_time"]
+        )
+
+
+@bp.route("/waitlist/join", methods=["POST"])
+def join_waitlist():
+    email = request.form["email"]
+    room_id = request.form["room"]
+    date = request.form["date"]
+    start = request.form["start"]
+    end = request.form["end"]
+
+    error, _ = validate_booking(room_id, date, start, end)
+    if error:
+        return render_template(
+            "booking.html",
+            rooms=get_read_db().execute("SELECT * FROM rooms").fetchall(),
+            message=error
+        )
+
+    conn = get_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        exists = conn.execute("""
+            SELECT 1
+            FROM waitlist
+            WHERE room_id=? AND date=? AND email=? AND start_time=? AND end_time=?
+        """, (room_id, date, email, start, end)).fetchone()
+
+        if not exists:
+            conn.execute("""
+                INSERT INTO waitlist (email, room_id, date, start_time, end_time, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (email, room_id, date, start, end, datetime.now().isoformat(timespec="seconds")))
+
+        # The slot may have opened up since the conflict was shown
+        promoted = promote_waitlist(conn, room_id, date, start, end)
         conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         conn.close()
-        return redirect(url_for("history", msg="deleted", email=email))
-    return redirect(url_for("history"))
+
+    if promoted:
+        sync_mirror(room_id, date, date)
+
+    notify_promoted(promoted)
+    if any(w["email"] == email for w in promoted):
+        return redirect(url_for("main.history", msg="success", email=email))
+    return redirect(url_for("main.history", msg="waitlisted", email=email))
+
+
+@bp.route("/waitlist/leave/<int:id>")
+def leave_waitlist(id):
+    conn = get_db()
+    row = conn.execute("SELECT email FROM waitlist WHERE id=?", (id,)).fetchone()
+    if row:
+        conn.execute("DELETE FROM waitlist WHERE id=?", (id,))
+        conn.commit()
+        conn.close()
+        return redirect(url_for("main.history", msg="left", email=row["email"]))
+    conn.close()
+    return redirect(url_for("main.history"))
+
+
+# CALENDAR FEEDS
+def calendar_response(kind, value, name):
+    import calendar_feed
+
+    key = f"{kind}:{value}"
+    conn = get_db()
+    generation, version = calendar_feed.feed_state(conn, key)
+    tag = calendar_feed.etag_for(key, version, generation)
+
+    # Nothing changed since the client's copy: skip the bookings query
+    if request.if_none_match.contains(tag):
+        conn.close()
+        response = Response(status=304)
+        response.set_etag(tag)
+        return response
+
+    events = calendar_feed.get_feed(conn, kind, value, version, generation, BLOCK_EMAIL)
+    conn.close()
+
+    body = calendar_feed.iter_feed(name, events)
+    if len(events) <= calendar_feed.STREAM_THRESHOLD:
+        body = "".join(body)
+
+    response = Response(body, mimetype="text/calendar")
+    response.set_etag(tag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Content-Disposition"] = f"inline; filename={kind}.ics"
+    return response
+
+
+@bp.route("/room/<int:id>/calendar.ics")
+def room_calendar(id):
+    conn = get_db()
+    room = conn.execute("SELECT room_number FROM rooms WHERE id=?", (id,)).fetchone()
+    conn.close()
+    if not room:
+        return "Room not found", 404
+    return calendar_response("room", id, f"Room {room['room_number']}")
+
+
+@bp.route("/history/calendar.ics")
+def history_calendar():
+    email = request.args.get("email")
+    if not email:
+        return "Missing email", 400
+    return calendar_response("email", email, "My Study Room Bookings")
+
 
 
 # STAFF LOGIN / LOGOUT
-@app.route("/staff-login", methods=["GET", "POST"])
+@bp.route("/staff-login", methods=["GET", "POST"])
 def staff_login():
     if request.method == "POST":
         username = request.form["username"]
@@ -385,7 +862,7 @@ def staff_login():
             session.permanent = True
             session["staff_logged_in"] = True
             session["staff_username"] = username
-            return redirect(url_for("staff_dashboard"))
+            return redirect(url_for("main.staff_dashboard"))
 
         return render_template("staff_login.html",
                                error="Invalid username or password.")
@@ -393,45 +870,50 @@ def staff_login():
     return render_template("staff_login.html")
 
 
-@app.route("/logout")
+@bp.route("/logout")
 def logout():
     session.pop("staff_logged_in", None)
     session.pop("staff_username", None)
-    return redirect(url_for("home"))
+    return redirect(url_for("main.home"))
 
 
 # STAFF DASHBOARD
-@app.route("/staff-dashboard")
+@bp.route("/staff-dashboard")
 def staff_dashboard():
     if not staff_required():
-        return redirect(url_for("staff_login"))
+        return redirect(url_for("main.staff_login"))
 
-    conn = get_db()
+    # Live counts come from the read mirror when enabled
+    read = get_read_db()
 
+    # Staff blocks are bookings too; leave them out of usage figures
     today = datetime.now().strftime("%Y-%m-%d")
-    bookings_today = conn.execute("""
+    bookings_today = read.execute("""
         SELECT COUNT(*) AS total
         FROM bookings
-        WHERE date=?
-    """, (today,)).fetchone()["total"]
+        WHERE date=? AND email != ?
+    """, (today, BLOCK_EMAIL)).fetchone()["total"]
 
     now = datetime.now().strftime("%H:%M")
-    active_now = conn.execute("""
+    active_now = read.execute("""
         SELECT COUNT(*) AS total
         FROM bookings
-        WHERE date=? AND start_time <= ? AND end_time > ?
-    """, (today, now, now)).fetchone()["total"]
+        WHERE date=? AND start_time <= ? AND end_time > ? AND email != ?
+    """, (today, now, now, BLOCK_EMAIL)).fetchone()["total"]
+
+    rooms_count = read.execute("SELECT COUNT(*) AS total FROM rooms").fetchone()["total"]
+    read.close()
 
-    rooms_count = conn.execute("SELECT COUNT(*) AS total FROM rooms").fetchone()["total"]
+    conn = get_db()
 
     most_booked = conn.execute("""
         SELECT rooms.room_number, COUNT(bookings.id) AS total
         FROM rooms
-        LEFT JOIN bookings ON rooms.id = bookings.room_id
+        LEFT JOIN bookings ON rooms.id = bookings.room_id AND bookings.email != ?
         GROUP BY rooms.room_number
         ORDER BY total DESC
         LIMIT 1
-    """).fetchone()
+    """, (BLOCK_EMAIL,)).fetchone()
 
     recent_bookings = conn.execute("""
         SELECT bookings.id, bookings.date, bookings.start_time, bookings.end_time,
@@ -442,6 +924,21 @@ def staff_dashboard():
         LIMIT 20
     """).fetchall()
 
+    waitlist_depth = conn.execute("""
+        SELECT rooms.room_number, waitlist.date, COUNT(*) AS waiting
+        FROM waitlist
+        JOIN rooms ON rooms.id = waitlist.room_id
+        WHERE waitlist.date >= ?
+        GROUP BY waitlist.room_id, waitlist.date
+        ORDER BY waiting DESC, waitlist.date
+        LIMIT 20
+    """, (today,)).fetchall()
+    waitlist_total = conn.execute("""
+        SELECT COUNT(*) AS total
+        FROM waitlist
+        WHERE date >= ?
+    """, (today,)).fetchone()["total"]
+
     conn.close()
 
     return render_template(
@@ -450,30 +947,242 @@ def staff_dashboard():
         active_now=active_now,
         rooms_count=rooms_count,
         most_booked=most_booked,
-        recent_bookings=recent_bookings
+        recent_bookings=recent_bookings,
+        waitlist_depth=waitlist_depth,
+        waitlist_total=waitlist_total
     )
 
 
 
 # STAFF CANCEL ANY BOOKING
-@app.route("/staff/cancel/<int:id>")
+@bp.route("/staff/cancel/<int:id>")
 def staff_cancel_booking(id):
     if not staff_required():
-        return redirect(url_for("staff_login"))
+        return redirect(url_for("main.staff_login"))
+
+    row, promoted = cancel_and_promote(id)
+    notify_promoted(promoted)
+    return redirect(url_for("main.staff_dashboard"))
+
+
+
+# BULK STAFF OPERATIONS
+def cancel_bookings_in_range(conn, room_id, start_date, end_date, start=None, end=None):
+    """
+    Delete a room's bookings between two dates (inclusive, end_date None
+    means open-ended), optionally only those overlapping start-end on each
+    day. Runs on the caller's transaction and returns the deleted bookings
+    as notices for queue_cancellation_emails().
+    """
+    where = "bookings.room_id=? AND bookings.date >= ?"
+    params = [room_id, start_date]
+    if end_date:
+        where += " AND bookings.date <= ?"
+        params.append(end_date)
+    if start and end:
+        where += " AND NOT (bookings.end_time <= ? OR bookings.start_time >= ?)"
+        params += [start, end]
+
+    rows = conn.execute(f"""
+        SELECT bookings.id, bookings.email, bookings.date,
+               bookings.start_time, bookings.end_time, rooms.room_number
+        FROM bookings
+        JOIN rooms ON rooms.id = bookings.room_id
+        WHERE {where}
+    """, params).fetchall()
+
+    conn.execute(f"DELETE FROM bookings WHERE {where}", params)
+
+    return [{
+        "email": r["email"],
+        "room_number": r["room_number"],
+        "date": r["date"],
+        "start_time": to_12h(r["start_time"]),
+        "end_time": to_12h(r["end_time"])
+    } for r in rows]
+
+
+def date_range(start_date, end_date):
+    day = datetime.strptime(start_date, "%Y-%m-%d")
+    last = datetime.strptime(end_date, "%Y-%m-%d")
+    while day <= last:
+        yield day.strftime("%Y-%m-%d")
+        day += timedelta(days=1)
+
+
+# Longest block-room period; each day is one row written in one transaction
+MAX_BLOCK_DAYS = 366
+
+
+def check_date_range(start_date, end_date, max_days=None):
+    """
+    Error message for a bad bulk date range, or None if both dates parse,
+    the range isn't backwards and (with max_days) it isn't too long.
+    """
+    try:
+        first = datetime.strptime(start_date, "%Y-%m-%d")
+        last = datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        return "Dates must be in YYYY-MM-DD format."
+    if last < first:
+        return "End date must not be before start date."
+    if max_days and (last - first).days + 1 > max_days:
+        return f"Date range cannot be longer than {max_days} days."
+    return None
+
+
+@bp.route("/staff/bulk")
+def staff_bulk():
+    if not staff_required():
+        return redirect(url_for("main.staff_login"))
 
     conn = get_db()
-    conn.execute("DELETE FROM bookings WHERE id=?", (id,))
-    conn.commit()
+    rooms = conn.execute("SELECT * FROM rooms ORDER BY room_number").fetchall()
     conn.close()
-    return redirect(url_for("staff_dashboard"))
+    return render_template("staff_bulk.html", rooms=rooms, msg=request.args.get("msg"))
+
+
+@bp.route("/staff/bulk-cancel", methods=["POST"])
+def staff_bulk_cancel():
+    if not staff_required():
+        return redirect(url_for("main.staff_login"))
+
+    room_id = request.form["room"]
+    start_date = request.form["start_date"]
+    end_date = request.form["end_date"]
+    start = request.form.get("start") or None
+    end = request.form.get("end") or None
+
+    error = check_date_range(start_date, end_date)
+    if error:
+        return redirect(url_for("main.staff_bulk", msg=error))
+
+    conn = get_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        notices = cancel_bookings_in_range(conn, room_id, start_date, end_date, start, end)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    sync_mirror(room_id, start_date, end_date)
+    queue_cancellation_emails(notices)
+    return redirect(url_for("main.staff_bulk", msg=f"{len(notices)} bookings cancelled."))
+
+
+@bp.route("/staff/block-room", methods=["POST"])
+def staff_block_room():
+    if not staff_required():
+        return redirect(url_for("main.staff_login"))
+
+    room_id = request.form["room"]
+    start_date = request.form["start_date"]
+    end_date = request.form["end_date"]
+    start = request.form.get("start") or "00:00"
+    end = request.form.get("end") or "24:00"
+
+    error = check_date_range(start_date, end_date, MAX_BLOCK_DAYS)
+    if error:
+        return redirect(url_for("main.staff_bulk", msg=error))
+
+    start_min = to_minutes(start)
+    end_min = to_minutes(end)
+    if start_min is None or end_min is None or end_min <= start_min:
+        return redirect(url_for("main.staff_bulk", msg="Invalid block period."))
+
+    conn = get_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        notices = cancel_bookings_in_range(conn, room_id, start_date, end_date, start, end)
+        conn.executemany("""
+            INSERT INTO bookings (email, room_id, date, start_time, end_time)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(BLOCK_EMAIL, room_id, day, start, end) for day in date_range(start_date, end_date)])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    sync_mirror(room_id, start_date, end_date)
+    queue_cancellation_emails(notices)
+    cancelled = len([n for n in notices if n["email"] != BLOCK_EMAIL])
+    return redirect(url_for("main.staff_bulk", msg=f"Room blocked, {cancelled} bookings cancelled."))
+
+
+@bp.route("/staff/bulk-update-rooms", methods=["POST"])
+def staff_bulk_update_rooms():
+    if not staff_required():
+        return redirect(url_for("main.staff_login"))
+
+    room_ids = request.form.getlist("rooms")
+
+    # Only fields that were filled in are changed
+    updates = {}
+    for field in ("capacity", "type", "status"):
+        value = request.form.get(field)
+        if value:
+            updates[field] = value
+
+    if not room_ids or not updates:
+        return redirect(url_for("main.staff_bulk", msg="Pick at least one room and one field."))
+
+    if "capacity" in updates:
+        try:
+            updates["capacity"] = int(updates["capacity"])
+        except ValueError:
+            updates["capacity"] = 0
+        if updates["capacity"] <= 0:
+            return redirect(url_for("main.staff_bulk", msg="Capacity must be a positive whole number."))
+
+    assignments = ", ".join(f"{field}=?" for field in updates)
+    conn = get_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            f"UPDATE rooms SET {assignments} WHERE id=?",
+            [list(updates.values()) + [room_id] for room_id in room_ids]
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    sync_mirror(rooms=True)
+    return redirect(url_for("main.staff_bulk", msg=f"{len(room_ids)} rooms updated."))
+
+
+
+# READ MIRROR CHECK (STAFF)
+@bp.route("/staff/mirror-check")
+def mirror_check():
+    if not staff_required():
+        return redirect(url_for("main.staff_login"))
+
+    mirror = current_app.extensions.get("read_mirror")
+    if not mirror:
+        return jsonify({"enabled": False})
+
+    report = mirror.check()
+    if not report["consistent"] and request.args.get("repair"):
+        mirror.load()
+        report["repaired"] = True
+    report["enabled"] = True
+    return jsonify(report)
 
 
 
 # ROOM MANAGEMENT (STAFF)
-@app.route("/manage-rooms")
+@bp.route("/manage-rooms")
 def manage_rooms():
     if not staff_required():
-        return redirect(url_for("staff_login"))
+        return redirect(url_for("main.staff_login"))
 
     conn = get_db()
     rooms = conn.execute("SELECT * FROM rooms ORDER BY room_number").fetchall()
@@ -481,10 +1190,10 @@ def manage_rooms():
     return render_template("manage_rooms.html", rooms=rooms)
 
 
-@app.route("/add-room", methods=["GET", "POST"])
+@bp.route("/add-room", methods=["GET", "POST"])
 def add_room():
     if not staff_required():
-        return redirect(url_for("staff_login"))
+        return redirect(url_for("main.staff_login"))
 
     if request.method == "POST":
         room_number = request.form["room_number"]
@@ -498,16 +1207,17 @@ def add_room():
         """, (room_number, capacity, room_type, "Available"))
         conn.commit()
         conn.close()
+        sync_mirror(rooms=True)
 
-        return redirect(url_for("manage_rooms"))
+        return redirect(url_for("main.manage_rooms"))
 
     return render_template("add_room.html")
 
 
-@app.route("/edit-room/<int:id>", methods=["GET", "POST"])
+@bp.route("/edit-room/<int:id>", methods=["GET", "POST"])
 def edit_room(id):
     if not staff_required():
-        return redirect(url_for("staff_login"))
+        return redirect(url_for("main.staff_login"))
 
     conn = get_db()
 
@@ -524,28 +1234,42 @@ def edit_room(id):
         """, (room_number, capacity, room_type, status, id))
         conn.commit()
         conn.close()
-        return redirect(url_for("manage_rooms"))
+        sync_mirror(rooms=True)
+        return redirect(url_for("main.manage_rooms"))
 
     room = conn.execute("SELECT * FROM rooms WHERE id=?", (id,)).fetchone()
     conn.close()
     return render_template("edit_room.html", room=room)
 
 
-@app.route("/delete-room/<int:id>")
+@bp.route("/delete-room/<int:id>")
 def delete_room(id):
     if not staff_required():
-        return redirect(url_for("staff_login"))
+        return redirect(url_for("main.staff_login"))
 
+    # Remove the room, its bookings and its waitlist together so no orphans are left
     conn = get_db()
-    conn.execute("DELETE FROM rooms WHERE id=?", (id,))
-    conn.commit()
-    conn.close()
-    return redirect(url_for("manage_rooms"))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        notices = cancel_bookings_in_range(conn, id, datetime.now().strftime("%Y-%m-%d"), None)
+        conn.execute("DELETE FROM bookings WHERE room_id=?", (id,))
+        conn.execute("DELETE FROM waitlist WHERE room_id=?", (id,))
+        conn.execute("DELETE FROM rooms WHERE id=?", (id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    sync_mirror(id, rooms=True)
+    queue_cancellation_emails(notices)
+    return redirect(url_for("main.manage_rooms"))
 
 
 
 # FILTER ROOMS (USER)
-@app.route("/filter", methods=["GET", "POST"])
+@bp.route("/filter", methods=["GET", "POST"])
 def filter_rooms():
     if request.method == "GET":
         return render_template("filter.html")
@@ -555,22 +1279,18 @@ def filter_rooms():
     end = request.form["end"]
     capacity = int(request.form["capacity"])
 
-    conn = get_db()
+    conn = get_read_db(date)
 
-    rooms = conn.execute("""
-        SELECT * FROM rooms WHERE capacity >= ?
-    """, (capacity,)).fetchall()
-
-    available = []
-    for room in rooms:
-        conflict = conn.execute("""
-            SELECT *
-            FROM bookings
-            WHERE room_id=? AND date=? AND NOT (end_time <= ? OR start_time >= ?)
-        """, (room["id"], date, start, end)).fetchone()
-
-        if not conflict:
-            available.append(room)
+    available = conn.execute("""
+        SELECT *
+        FROM rooms
+        WHERE capacity >= ?
+          AND NOT EXISTS (
+              SELECT 1
+              FROM bookings
+              WHERE room_id=rooms.id AND date=? AND NOT (end_time <= ? OR start_time >= ?)
+          )
+    """, (capacity, date, start, end)).fetchall()
 
     conn.close()
 
@@ -586,44 +1306,48 @@ def filter_rooms():
 
 
 # ANALYTICS (STAFF ONLY)
-@app.route("/analytics")
+@bp.route("/analytics")
 def analytics():
     if not staff_required():
-        return redirect(url_for("staff_login"))
+        return redirect(url_for("main.staff_login"))
 
     conn = get_db()
 
+    # Staff blocks are stored as bookings but are not usage
     bookings_per_room = conn.execute("""
         SELECT rooms.room_number, COUNT(bookings.id) AS total
         FROM rooms
-        LEFT JOIN bookings ON rooms.id = bookings.room_id
+        LEFT JOIN bookings ON rooms.id = bookings.room_id AND bookings.email != ?
         GROUP BY rooms.room_number
         ORDER BY total DESC
-    """).fetchall()
+    """, (BLOCK_EMAIL,)).fetchall()
 
     hours_per_room = conn.execute("""
         SELECT rooms.room_number,
-               SUM((julianday('2000-01-01 ' || end_time) -
-                    julianday('2000-01-01 ' || start_time)) * 24.0) AS total_hours
+               SUM((CAST(substr(end_time, 1, 2) AS INTEGER) * 60 + CAST(substr(end_time, 4, 2) AS INTEGER)) -
+                   (CAST(substr(start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(start_time, 4, 2) AS INTEGER))
+               ) / 60.0 AS total_hours
         FROM rooms
-        LEFT JOIN bookings ON rooms.id = bookings.room_id
+        LEFT JOIN bookings ON rooms.id = bookings.room_id AND bookings.email != ?
         GROUP BY rooms.room_number
         ORDER BY total_hours DESC
-    """).fetchall()
+    """, (BLOCK_EMAIL,)).fetchall()
 
     times = conn.execute("""
         SELECT start_time, COUNT(*) AS total
         FROM bookings
+        WHERE email != ?
         GROUP BY start_time
         ORDER BY total DESC
-    """).fetchall()
+    """, (BLOCK_EMAIL,)).fetchall()
 
     bookings_per_day = conn.execute("""
         SELECT date, COUNT(*) AS total
         FROM bookings
+        WHERE email != ?
         GROUP BY date
         ORDER BY date DESC
-    """).fetchall()
+    """, (BLOCK_EMAIL,)).fetchall()
 
     conn.close()
 
@@ -637,6 +1361,37 @@ def analytics():
 
 
 
+# UTILIZATION HEATMAP (STAFF ONLY)
+@bp.route("/analytics/heatmap")
+def analytics_heatmap():
+    if not staff_required():
+        return redirect(url_for("main.staff_login"))
+
+    from heatmap import compute_heatmap, heatmap_to_json, heatmap_to_csv
+
+    start_date = request.args.get("start") or None
+    end_date = request.args.get("end") or None
+    fmt = request.args.get("format", "json")
+
+    conn = get_db()
+    try:
+        result = compute_heatmap(conn, start_date, end_date, exclude_email=BLOCK_EMAIL)
+    except ValueError:
+        return "start and end must be YYYY-MM-DD dates, start before end", 400
+    finally:
+        conn.close()
+
+    if fmt == "csv":
+        return Response(
+            heatmap_to_csv(result),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=heatmap.csv"}
+        )
+
+    return jsonify(heatmap_to_json(result))
+
+
+
 # RUN APP
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
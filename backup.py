@@ -0,0 +1,316 @@
+"""
+Online backup and restore for rooms.db and staff.db.
+
+Snapshots use sqlite3.Connection.backup in small page steps, so the app can
+keep reading and writing while a copy is taken.
+
+    python backup.py snapshot                 # one snapshot of each database
+    python backup.py schedule --every 3600    # snapshot every hour, keep --keep
+    python backup.py verify                   # integrity-check latest snapshots
+    python backup.py restore rooms.db backups/rooms-20260101-120000.db
+    python backup.py bench                    # snapshot time vs booking latency
+"""
+import argparse
+import glob
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+DATABASES = ["rooms.db", "staff.db"]
+BACKUP_DIR = "backups"
+KEEP = 24
+
+# Pages copied per step and the pause between steps. Locks on the source
+# are only held during a step, so writers get in between steps.
+PAGES_PER_STEP = 64
+STEP_SLEEP = 0.005
+
+# The backup restarts whenever another connection writes to the source.
+# After this many restarts the rest is copied in one step, which in WAL
+# mode still only holds a read snapshot and does not block writers.
+MAX_RESTARTS = 5
+
+
+# SNAPSHOT
+def _copy(src, dst, pages=PAGES_PER_STEP, sleep=STEP_SLEEP):
+    """
+    Copy src into dst page-step by page-step. Returns the number of restarts.
+    """
+    state = {"remaining": None, "restarts": 0}
+
+    class _TooManyRestarts(Exception):
+        pass
+
+    def progress(status, remaining, total):
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+
+    try:
+        src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+    except _TooManyRestarts:
+        src.backup(dst, pages=-1)
+
+    return state["restarts"]
+
+
+def snapshot(db_path, backup_dir=BACKUP_DIR, pages=PAGES_PER_STEP):
+    """
+    Take one online snapshot of db_path. Returns (snapshot_path, seconds, restarts).
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    target = os.path.join(backup_dir, f"{stem}-{stamp}.db")
+
+    # Write to a temp name first so a half-written file is never mistaken
+    # for a finished snapshot.
+    partial = target + ".partial"
+
+    start = time.perf_counter()
+    src = sqlite3.connect(db_path)
+    try:
+        src.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError:
+        pass
+    dst = sqlite3.connect(partial)
+    try:
+        restarts = _copy(src, dst, pages=pages)
+        # The copy inherits WAL mode from the source; switch it back so the
+        # snapshot is a single self-contained file.
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+    os.replace(partial, target)
+    elapsed = time.perf_counter() - start
+
+    return target, elapsed, restarts
+
+
+def list_snapshots(db_path, backup_dir=BACKUP_DIR):
+    """
+    Snapshots for db_path, oldest first.
+    """
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return sorted(glob.glob(os.path.join(backup_dir, f"{stem}-*.db")))
+
+
+def prune(db_path, backup_dir=BACKUP_DIR, keep=KEEP):
+    """
+    Delete all but the newest `keep` snapshots. Returns the deleted paths.
+    """
+    old = list_snapshots(db_path, backup_dir)[:-keep] if keep > 0 else []
+    for path in old:
+        for extra in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(extra):
+                os.remove(extra)
+    return old
+
+
+# VERIFY
+def verify(snapshot_path, db_path=None):
+    """
+    Run PRAGMA integrity_check on a snapshot. If db_path is given, also
+    list tables whose row counts differ from the live database.
+    Returns a list of problems (empty when the snapshot is good).
+    """
+    problems = []
+    conn = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            problems.append(f"integrity_check: {result}")
+
+        tables = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        if not tables:
+            problems.append("no tables")
+
+        if db_path:
+            live = sqlite3.connect(db_path)
+            try:
+                for table in tables:
+                    snap_count = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                    live_count = live.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                    if snap_count != live_count:
+                        problems.append(f"{table}: {snap_count} rows in snapshot, {live_count} live")
+            finally:
+                live.close()
+    except sqlite3.DatabaseError as e:
+        problems.append(str(e))
+    finally:
+        conn.close()
+
+    return problems
+
+
+# RESTORE
+def restore(db_path, snapshot_path, pages=PAGES_PER_STEP):
+    """
+    Copy a verified snapshot back over db_path using the backup API, so
+    open app connections see the restored data without a restart.
+
+    Restoring rooms.db also gives it a new feed generation, since the
+    snapshot's feed versions are older than ones clients have seen.
+    """
+    problems = verify(snapshot_path)
+    if problems:
+        raise ValueError(f"refusing to restore {snapshot_path}: {'; '.join(problems)}")
+
+    src = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+    dst = sqlite3.connect(db_path)
+    try:
+        src.backup(dst, pages=pages, sleep=STEP_SLEEP)
+        if dst.execute("SELECT 1 FROM sqlite_master WHERE name='feed_versions'").fetchone():
+            from init_db import new_feed_generation
+            new_feed_generation(dst)
+            dst.commit()
+    finally:
+        dst.close()
+        src.close()
+
+
+# BENCHMARK
+def _latency_during(db_path, seconds, work=None):
+    """
+    Insert bookings in a loop for `seconds` (or until `work` finishes) and
+    return the per-commit latencies in milliseconds.
+    """
+    latencies = []
+    done = threading.Event()
+
+    def writer():
+        conn = sqlite3.connect(db_path, timeout=30)
+        i = 0
+        while not done.is_set():
+            t0 = time.perf_counter()
+            conn.execute("""
+                INSERT INTO bookings (email, room_id, date, start_time, end_time)
+                VALUES (?, ?, ?, ?, ?)
+            """, (f"bench{i}@yorku.ca", 1, "2030-01-01", "09:00", "10:00"))
+            conn.commit()
+            latencies.append((time.perf_counter() - t0) * 1000)
+            i += 1
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    result = None
+    if work:
+        result = work()
+    else:
+        time.sleep(seconds)
+    done.set()
+    thread.join()
+    return latencies, result
+
+
+def _summary(latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1] if ordered else 0.0
+    return (f"n={len(ordered)}  p50 {statistics.median(ordered):.2f} ms  "
+            f"p95 {p95:.2f} ms  max {ordered[-1]:.2f} ms")
+
+
+def bench(rows=200_000, pages=PAGES_PER_STEP):
+    """
+    Build a throwaway rooms database with `rows` bookings, then compare
+    booking insert latency with and without a snapshot running.
+    """
+    from init_db import init_db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "rooms.db")
+        init_db(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.executemany("""
+            INSERT INTO bookings (email, room_id, date, start_time, end_time)
+            VALUES (?, ?, ?, ?, ?)
+        """, ((f"user{i}@yorku.ca", i % 5 + 1, f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+               "10:00", "11:00") for i in range(rows)))
+        conn.commit()
+        conn.close()
+        size_mb = os.path.getsize(db_path) / 1e6
+
+        baseline, _ = _latency_during(db_path, 2.0)
+        during, (path, elapsed, restarts) = _latency_during(
+            db_path, 0, work=lambda: snapshot(db_path, os.path.join(tmp, "backups"), pages)
+        )
+        problems = verify(path)
+
+    print(f"database: {rows} bookings, {size_mb:.1f} MB")
+    print(f"snapshot: {elapsed:.2f} s, {restarts} restarts, "
+          f"verify {'ok' if not problems else problems}")
+    print(f"booking latency idle:           {_summary(baseline)}")
+    print(f"booking latency during backup:  {_summary(during)}")
+
+
+# CLI
+def main():
+    parser = argparse.ArgumentParser(description="Online SQLite backups")
+    parser.add_argument("--dir", default=BACKUP_DIR, help="backup directory")
+    parser.add_argument("--pages", type=int, default=PAGES_PER_STEP, help="pages per step")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("snapshot", help="take one snapshot of each database")
+    p.add_argument("--keep", type=int, default=KEEP)
+
+    p = sub.add_parser("schedule", help="take snapshots on an interval")
+    p.add_argument("--every", type=int, default=3600, help="seconds between snapshots")
+    p.add_argument("--keep", type=int, default=KEEP)
+
+    sub.add_parser("verify", help="check the latest snapshot of each database")
+
+    p = sub.add_parser("restore", help="restore a database from a snapshot")
+    p.add_argument("database")
+    p.add_argument("snapshot")
+
+    p = sub.add_parser("bench", help="measure snapshot time and booking latency")
+    p.add_argument("--rows", type=int, default=200_000)
+
+    args = parser.parse_args()
+
+    def run_snapshots(keep):
+        for db in DATABASES:
+            path, elapsed, restarts = snapshot(db, args.dir, args.pages)
+            problems = verify(path)
+            status = "ok" if not problems else "FAILED: " + "; ".join(problems)
+            print(f"{db} -> {path} ({elapsed:.2f} s, {restarts} restarts) verify {status}")
+            for old in prune(db, args.dir, keep):
+                print(f"  removed {old}")
+
+    if args.command == "snapshot":
+        run_snapshots(args.keep)
+
+    elif args.command == "schedule":
+        while True:
+            run_snapshots(args.keep)
+            time.sleep(args.every)
+
+    elif args.command == "verify":
+        for db in DATABASES:
+            snaps = list_snapshots(db, args.dir)
+            if not snaps:
+                print(f"{db}: no snapshots")
+                continue
+            problems = verify(snaps[-1])
+            print(f"{db}: {snaps[-1]} {'ok' if not problems else '; '.join(problems)}")
+
+    elif args.command == "restore":
+        restore(args.database, args.snapshot, args.pages)
+        print(f"{args.database} restored from {args.snapshot}")
+
+    elif args.command == "bench":
+        bench(args.rows, args.pages)
+
+
+if __name__ == "__main__":
+    main()
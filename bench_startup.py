@@ -0,0 +1,82 @@
+"""
+Cold-start benchmark.
+
+Each run starts a fresh Python process that imports app.py, builds an app
+with create_app() and serves GET / through the test client. The time from
+interpreter start to the first response is reported.
+
+    python bench_startup.py --runs 10 --max-ms 400
+
+Exits with status 1 if the median exceeds --max-ms, or if the mail modules
+were loaded before any email was sent.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t_import = time.perf_counter()
+app = create_app()
+t_app = time.perf_counter()
+resp = app.test_client().get("/")
+t_first = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t_import - t0) * 1000,
+    "create_ms": (t_app - t_import) * 1000,
+    "first_response_ms": (t_first - t_app) * 1000,
+    "status": resp.status_code,
+    "mail_loaded": "smtplib" in sys.modules or "email_config" in sys.modules,
+}))
+"""
+
+
+def run_once():
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        capture_output=True, text=True, check=True
+    )
+    total = (time.perf_counter() - start) * 1000
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["total_ms"] = total
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time-to-first-response")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="fail if median total time exceeds this")
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+
+    for key in ("import_ms", "create_ms", "first_response_ms", "total_ms"):
+        values = [r[key] for r in results]
+        print(f"{key:>18}: median {statistics.median(values):8.1f}  "
+              f"min {min(values):8.1f}  max {max(values):8.1f}")
+
+    failed = False
+    if any(r["status"] != 200 for r in results):
+        print("FAIL: first response was not 200")
+        failed = True
+    if any(r["mail_loaded"] for r in results):
+        print("FAIL: mail modules were imported at startup")
+        failed = True
+
+    median_total = statistics.median(r["total_ms"] for r in results)
+    if args.max_ms is not None and median_total > args.max_ms:
+        print(f"FAIL: median {median_total:.1f} ms > {args.max_ms:.1f} ms")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
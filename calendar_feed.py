@@ -0,0 +1,159 @@
+"""
+iCalendar (.ics) feeds for a room or a user's bookings.
+
+Every booking change bumps a per-feed version in the feed_versions table
+(maintained by triggers, see init_db.py). The version, together with the
+database's feed generation, is the feed's ETag, so a poll that hasn't
+missed a change is answered with one primary-key lookup and a 304.
+
+A restore rolls versions back and can hand out booking ids again, so it
+also replaces the generation (see backup.restore), and every cache here
+is keyed by it.
+
+Rendered events are cached per booking. Bookings are never edited in
+place and AUTOINCREMENT ids are never reused within a generation, so a
+rebuilt feed only has to format bookings it hasn't seen before.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+# How far back feeds reach
+HISTORY_DAYS = 90
+
+# Feeds with more events than this are streamed instead of sent in one body
+STREAM_THRESHOLD = 500
+
+MAX_FEEDS = 256
+MAX_EVENTS = 100_000
+
+_feeds = OrderedDict()   # (generation, key) -> (version, [event strings])
+_events = OrderedDict()  # (generation, booking id, room number, kind) -> event string
+
+# Both caches are shared by all request threads; a get + move_to_end must
+# not interleave with another thread's eviction
+_lock = threading.Lock()
+
+HEADER = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    "PRODID:-//York University//Study Room Tracker//EN\r\n"
+    "CALSCALE:GREGORIAN\r\n"
+    "X-WR-CALNAME:{name}\r\n"
+)
+FOOTER = "END:VCALENDAR\r\n"
+
+
+# VERSIONS
+def feed_state(conn, key):
+    """
+    (generation, version) for a feed key, in one query.
+    """
+    row = conn.execute("""
+        SELECT (SELECT token FROM feed_generation WHERE id = 1),
+               (SELECT version FROM feed_versions WHERE key = ?)
+    """, (key,)).fetchone()
+    return row[0] or "", row[1] or 0
+
+
+def etag_for(key, version, generation):
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return f"{digest}-{generation}-{version}"
+
+
+# RENDERING
+def _escape(text):
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _stamp(date, time_str):
+    """
+    'YYYY-MM-DD' + 'HH:MM' -> floating local 'YYYYMMDDTHHMMSS'. '24:00' rolls
+    over to midnight of the next day.
+    """
+    if time_str == "24:00":
+        day = datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)
+        return day.strftime("%Y%m%dT000000")
+    return datetime.strptime(f"{date} {time_str}", "%Y-%m-%d %H:%M").strftime("%Y%m%dT%H%M%S")
+
+
+def _render_event(b, kind):
+    if kind == "room":
+        summary = "Blocked" if b["blocked"] else "Booked"
+    else:
+        summary = f"Study Room {b['room_number']}"
+
+    return (
+        "BEGIN:VEVENT\r\n"
+        f"UID:booking-{b['id']}@study-room-tracker\r\n"
+        f"DTSTAMP:{_stamp(b['date'], '00:00')}Z\r\n"
+        f"DTSTART:{_stamp(b['date'], b['start_time'])}\r\n"
+        f"DTEND:{_stamp(b['date'], b['end_time'])}\r\n"
+        f"SUMMARY:{_escape(summary)}\r\n"
+        f"LOCATION:{_escape('Room ' + b['room_number'])}\r\n"
+        "END:VEVENT\r\n"
+    )
+
+
+def _event(b, kind, generation):
+    key = (generation, b["id"], b["room_number"], kind)
+    with _lock:
+        text = _events.get(key)
+        if text is not None:
+            _events.move_to_end(key)
+            return text
+
+    text = _render_event(b, kind)
+    with _lock:
+        _events[key] = text
+        if len(_events) > MAX_EVENTS:
+            _events.popitem(last=False)
+    return text
+
+
+# FEEDS
+def _build(conn, kind, where, params, generation, block_email):
+    since = (datetime.now() - timedelta(days=HISTORY_DAYS)).strftime("%Y-%m-%d")
+    rows = conn.execute(f"""
+        SELECT bookings.id, bookings.date, bookings.start_time, bookings.end_time,
+               bookings.email = ? AS blocked, rooms.room_number
+        FROM bookings
+        JOIN rooms ON rooms.id = bookings.room_id
+        WHERE {where} AND bookings.date >= ?
+        ORDER BY bookings.date, bookings.start_time
+    """, [block_email] + params + [since])
+    return [_event(b, kind, generation) for b in rows]
+
+
+def get_feed(conn, kind, value, version, generation, block_email):
+    """
+    Return the event list for a 'room' feed (value = room id) or an
+    'email' feed (value = email address), rebuilding only if the feed's
+    version moved since it was cached in this generation.
+    """
+    key = (generation, f"{kind}:{value}")
+    with _lock:
+        cached = _feeds.get(key)
+        if cached and cached[0] == version:
+            _feeds.move_to_end(key)
+            return cached[1]
+
+    if kind == "room":
+        events = _build(conn, kind, "bookings.room_id = ?", [value], generation, block_email)
+    else:
+        events = _build(conn, kind, "bookings.email = ?", [value], generation, block_email)
+
+    with _lock:
+        _feeds[key] = (version, events)
+        if len(_feeds) > MAX_FEEDS:
+            _feeds.popitem(last=False)
+    return events
+
+
+def iter_feed(name, events):
+    yield HEADER.format(name=_escape(name))
+    for text in events:
+        yield text
+    yield FOOTER
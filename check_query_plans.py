@@ -0,0 +1,271 @@
+"""
+Query-plan regression check.
+
+Builds a realistically sized rooms.db in a temp directory, drives every
+route of the app against it and records each SQL statement through the
+SQL_TRACE hook. Then, per route:
+
+  - EXPLAIN QUERY PLAN must not show a full scan of bookings or waitlist
+    (analytics routes are exempt; an index walk is fine under LIMIT)
+  - the same SELECT must not run more than MAX_REPEATS times in one
+    request (a per-row query inside a loop)
+
+Every route in the app must be driven here, so a new route can't slip in
+unchecked.
+
+    python check_query_plans.py            # exits 1 on any failure
+    python check_query_plans.py --verbose  # also print every plan
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from init_db import init_db
+from init_staff import init_staff_db
+
+FIXTURE_ROOMS = 60
+PAST_DAYS = 600
+FUTURE_DAYS = 120
+MAX_REPEATS = 3
+
+# Tables that grow with usage; a full scan of these fails the check
+LARGE_TABLES = ("bookings", "waitlist")
+
+# Reports over the whole history scan by design
+FULL_SCAN_ALLOWED = {"main.analytics", "main.analytics_heatmap"}
+
+PLANNED = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+# FIXTURE
+def build_fixture(tmp):
+    """
+    rooms.db with FIXTURE_ROOMS rooms and a few bookings per room per day
+    from PAST_DAYS ago to FUTURE_DAYS ahead, plus waiters on one booking.
+    """
+    rooms_db = os.path.join(tmp, "rooms.db")
+    staff_db = os.path.join(tmp, "staff.db")
+    init_db(rooms_db)
+    init_staff_db(staff_db)
+
+    conn = sqlite3.connect(rooms_db)
+    conn.execute("DELETE FROM rooms")
+    conn.executemany(
+        "INSERT INTO rooms (id, room_number, capacity, type, status) VALUES (?, ?, ?, ?, ?)",
+        [(i, str(100 + i), 2 + i % 9, ("Study", "Quiet", "Group")[i % 3], "Available")
+         for i in range(1, FIXTURE_ROOMS + 1)]
+    )
+
+    today = date.today()
+
+    def bookings():
+        for offset in range(-PAST_DAYS, FUTURE_DAYS):
+            day = (today + timedelta(days=offset)).isoformat()
+            for room in range(1, FIXTURE_ROOMS + 1):
+                for k in range((room * 7 + offset) % 9):
+                    hour = 8 + k
+                    yield (f"user{(room * 31 + offset * 7 + k) % 5000}@yorku.ca", room, day,
+                           f"{hour:02d}:00", f"{hour + 1:02d}:00")
+
+    conn.executemany("""
+        INSERT INTO bookings (email, room_id, date, start_time, end_time)
+        VALUES (?, ?, ?, ?, ?)
+    """, bookings())
+
+    # A booking tomorrow with a queue behind it, cancelled by the driver
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    conn.execute("DELETE FROM bookings WHERE room_id=1 AND date=?", (tomorrow,))
+    conn.execute("""
+        INSERT INTO bookings (email, room_id, date, start_time, end_time)
+        VALUES ('holder@yorku.ca', 1, ?, '10:00', '12:00')
+    """, (tomorrow,))
+    conn.executemany("""
+        INSERT INTO waitlist (email, room_id, date, start_time, end_time, created_at)
+        VALUES (?, 1, ?, ?, ?, '2026-01-01T00:00:00')
+    """, [(f"waiter{i}@yorku.ca", tomorrow, f"{10 + i % 2}:00", f"{11 + i % 2}:00")
+          for i in range(8)])
+    conn.commit()
+
+    counts = conn.execute("SELECT (SELECT COUNT(*) FROM bookings), (SELECT COUNT(*) FROM waitlist)").fetchone()
+    conn.close()
+    return rooms_db, staff_db, counts
+
+
+# DRIVER
+def drive(app, rooms_db):
+    """
+    Issue one request per route. Yields (endpoint, method, path, status)
+    after each request has run.
+    """
+    today = date.today()
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    next_week = (today + timedelta(days=7)).isoformat()
+    db = sqlite3.connect(rooms_db)
+    db.row_factory = sqlite3.Row
+    client = app.test_client()
+    adapter = app.url_map.bind("localhost")
+
+    def call(method, path, data=None):
+        if method == "GET":
+            response = client.get(path)
+        else:
+            response = client.post(path, data=data)
+        endpoint = adapter.match(path.split("?")[0], method=method)[0]
+        return endpoint, method, path, response.status_code
+
+    # Public pages
+    yield call("GET", "/")
+    yield call("GET", "/rooms")
+    yield call("GET", "/room/1")
+    yield call("GET", "/room/1/calendar.ics")
+    yield call("GET", f"/schedule?rooms=1&rooms=2&start={today.isoformat()}&end={next_week}")
+    yield call("GET", "/book?room_id=1")
+    yield call("GET", "/filter")
+    yield call("POST", "/filter", {"date": tomorrow, "start": "10:00", "end": "11:00", "capacity": "4"})
+    yield call("POST", "/submit-booking", {"email": "new@yorku.ca", "room": "2", "date": next_week,
+                                           "start": "20:00", "end": "21:00"})
+    yield call("POST", "/submit-booking", {"email": "late@yorku.ca", "room": "1", "date": tomorrow,
+                                           "start": "10:00", "end": "11:00"})
+    yield call("POST", "/waitlist/join", {"email": "late@yorku.ca", "room": "1", "date": tomorrow,
+                                          "start": "10:00", "end": "11:00"})
+    yield call("GET", "/history?email=user42@yorku.ca")
+    yield call("GET", "/history/calendar.ics?email=user42@yorku.ca")
+
+    waiter = db.execute("SELECT id FROM waitlist WHERE email='late@yorku.ca'").fetchone()
+    yield call("GET", f"/waitlist/leave/{waiter['id']}")
+
+    held = db.execute("SELECT id FROM bookings WHERE email='holder@yorku.ca'").fetchone()
+    yield call("GET", f"/cancel/{held['id']}")
+
+    # Staff pages
+    yield call("GET", "/staff-login")
+    yield call("POST", "/staff-login", {"username": "admin", "password": "Admin123"})
+    yield call("GET", "/staff-dashboard")
+
+    booking = db.execute("SELECT id FROM bookings WHERE room_id=3 AND date=?", (next_week,)).fetchone()
+    yield call("GET", f"/staff/cancel/{booking['id']}")
+    yield call("GET", "/staff/bulk")
+    yield call("POST", "/staff/bulk-cancel", {"room": "4", "start_date": tomorrow, "end_date": next_week})
+    yield call("POST", "/staff/block-room", {"room": "5", "start_date": tomorrow, "end_date": next_week,
+                                             "start": "09:00", "end": "17:00"})
+    yield call("POST", "/staff/bulk-update-rooms", {"rooms": ["6", "7", "8"], "status": "Available"})
+    yield call("GET", "/staff/mirror-check")
+    yield call("GET", "/manage-rooms")
+    yield call("GET", "/add-room")
+    yield call("POST", "/add-room", {"room_number": "999", "capacity": "4", "type": "Study"})
+    yield call("GET", "/edit-room/9")
+    yield call("POST", "/edit-room/9", {"room_number": "109", "capacity": "5", "type": "Study",
+                                        "status": "Available"})
+
+    new_room = db.execute("SELECT id FROM rooms WHERE room_number='999'").fetchone()
+    yield call("GET", f"/delete-room/{new_room['id']}")
+    yield call("GET", "/analytics")
+    yield call("GET", "/analytics/heatmap")
+    yield call("GET", "/logout")
+
+    db.close()
+
+
+# CHECKS
+def normalize(sql):
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    return " ".join(sql.split())
+
+
+def full_scans(plan, sql):
+    """
+    Plan lines that read a large table end to end.
+    """
+    bad = []
+    limited = re.search(r"\bLIMIT\b", sql, re.IGNORECASE)
+    for line in plan:
+        match = re.match(r"SCAN (\w+)(.*)", line)
+        if not match or match.group(1) not in LARGE_TABLES:
+            continue
+        if "INDEX" in match.group(2) and limited:
+            continue
+        bad.append(line)
+    return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN regression check")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    from app import create_app
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        rooms_db, staff_db, (n_bookings, n_waiters) = build_fixture(tmp)
+        print(f"fixture: {FIXTURE_ROOMS} rooms, {n_bookings} bookings, {n_waiters} waitlist entries")
+
+        statements = []
+        app = create_app({
+            "ROOMS_DB": rooms_db,
+            "STAFF_DB": staff_db,
+            "MAIL_ENABLED": False,
+            "SQL_TRACE": statements.append,
+        })
+
+        by_endpoint = defaultdict(list)
+        for endpoint, method, path, status in drive(app, rooms_db):
+            if status >= 500:
+                failures.append(f"{method} {path}: returned {status}")
+            by_endpoint[endpoint].append((method, path, list(statements)))
+            statements.clear()
+
+        missing = sorted(
+            rule.endpoint for rule in app.url_map.iter_rules()
+            if rule.endpoint != "static" and rule.endpoint not in by_endpoint
+        )
+        for endpoint in missing:
+            failures.append(f"{endpoint}: route is not driven by check_query_plans.py")
+
+        explain = sqlite3.connect(rooms_db)
+        total = 0
+        for endpoint, runs in sorted(by_endpoint.items()):
+            for method, path, sqls in runs:
+                sqls = [s for s in sqls if not s.lstrip().startswith("--")]
+                total += len(sqls)
+
+                repeats = Counter(normalize(s) for s in sqls
+                                  if s.lstrip().upper().startswith("SELECT"))
+                for sql, n in repeats.items():
+                    if n > MAX_REPEATS:
+                        failures.append(f"{method} {path}: SELECT run {n} times in one request: {sql}")
+
+                seen = set()
+                for sql in sqls:
+                    key = normalize(sql)
+                    if key in seen or not sql.lstrip().upper().startswith(PLANNED):
+                        continue
+                    seen.add(key)
+
+                    plan = [row[3] for row in explain.execute("EXPLAIN QUERY PLAN " + sql)]
+                    if args.verbose:
+                        print(f"\n{method} {path}\n  {key}\n    " + "\n    ".join(plan))
+
+                    if endpoint in FULL_SCAN_ALLOWED:
+                        continue
+                    for line in full_scans(plan, sql):
+                        failures.append(f"{method} {path}: {line}\n    {key}")
+        explain.close()
+
+    print(f"checked {total} statements across {len(by_endpoint)} routes")
+    if failures:
+        print(f"\n{len(failures)} problem(s):")
+        for f in failures:
+            print(f"  - {f}")
+        sys.exit(1)
+    print("all query plans ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Concurrent-write check for the read mirror.
+
+Builds a rooms.db in a temp directory, starts the app with READ_MIRROR on
+and has several threads book the same room and day at once through
+/submit-booking. The mirror's lock is slowed down so refreshes overlap the
+way they do under a threaded server. Afterwards every booking on disk must
+be in the mirror and mirror-backed conflict checks must refuse the taken
+slots.
+
+    python check_read_mirror.py              # exits 1 on any failure
+    python check_read_mirror.py --rounds 20
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from init_db import init_db
+from init_staff import init_staff_db
+
+THREADS = 8
+
+
+class _SlowLock:
+    """
+    Lock that waits a moment before acquiring, widening the gap between a
+    refresh's disk read and its mirror update.
+    """
+    def __init__(self, lock):
+        self._lock = lock
+
+    def __enter__(self):
+        time.sleep(random.uniform(0, 0.005))
+        self._lock.acquire()
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+def run_round(app, rooms_db, day):
+    """
+    Book THREADS one-hour slots in room 1 on `day` concurrently. Returns a
+    list of problems.
+    """
+    barrier = threading.Barrier(THREADS)
+
+    def book(i):
+        client = app.test_client()
+        barrier.wait()
+        client.post("/submit-booking", data={
+            "email": f"racer{i}@yorku.ca", "room": "1", "date": day,
+            "start": f"{8 + i:02d}:00", "end": f"{9 + i:02d}:00",
+        })
+
+    threads = [threading.Thread(target=book, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    problems = []
+    mirror = app.extensions["read_mirror"]
+    report = mirror.check()
+    if not report["consistent"]:
+        problems.append(f"{day}: mirror out of sync: {report['bookings']}")
+
+    db = sqlite3.connect(rooms_db)
+    on_disk = db.execute("SELECT COUNT(*) FROM bookings WHERE room_id=1 AND date=?", (day,)).fetchone()[0]
+    db.close()
+    if on_disk != THREADS:
+        problems.append(f"{day}: {on_disk} of {THREADS} bookings on disk")
+
+    # Every slot is taken now; a second booking must hit the conflict check
+    client = app.test_client()
+    for i in range(THREADS):
+        client.post("/submit-booking", data={
+            "email": "late@yorku.ca", "room": "1", "date": day,
+            "start": f"{8 + i:02d}:00", "end": f"{9 + i:02d}:00",
+        })
+    db = sqlite3.connect(rooms_db)
+    doubled = db.execute("SELECT COUNT(*) FROM bookings WHERE email='late@yorku.ca' AND date=?",
+                         (day,)).fetchone()[0]
+    db.close()
+    if doubled:
+        problems.append(f"{day}: {doubled} slot(s) double-booked")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read mirror concurrent-write check")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    from app import create_app
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        rooms_db = os.path.join(tmp, "rooms.db")
+        staff_db = os.path.join(tmp, "staff.db")
+        init_db(rooms_db)
+        init_staff_db(staff_db)
+
+        app = create_app({
+            "ROOMS_DB": rooms_db,
+            "STAFF_DB": staff_db,
+            "MAIL_ENABLED": False,
+            "READ_MIRROR": True,
+        })
+        mirror = app.extensions["read_mirror"]
+        mirror.lock = _SlowLock(mirror.lock)
+
+        first = date.today() + timedelta(days=30)
+        for n in range(args.rounds):
+            failures += run_round(app, rooms_db, (first + timedelta(days=n)).isoformat())
+
+    print(f"{args.rounds} rounds of {THREADS} concurrent bookings")
+    if failures:
+        print(f"\n{len(failures)} problem(s):")
+        for f in failures:
+            print(f"  - {f}")
+        sys.exit(1)
+    print("read mirror ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import csv
+import io
+from datetime import datetime
+
+import numpy as np
+
+SLOT_MINUTES = 15
+DAY_MINUTES = 24 * 60
+SLOTS_PER_DAY = DAY_MINUTES // SLOT_MINUTES
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Rows are fetched from SQLite in chunks and stacked into NumPy arrays,
+# so memory stays bounded on multi-million row histories.
+FETCH_CHUNK = 200_000
+
+
+# LOADING
+def load_rooms(conn):
+    """
+    Return (room_ids, room_numbers, capacities) sorted by room id.
+    """
+    rows = conn.execute("""
+        SELECT id, room_number, capacity
+        FROM rooms
+        ORDER BY id
+    """).fetchall()
+
+    room_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    room_numbers = [r[1] for r in rows]
+    capacities = np.array([r[2] for r in rows], dtype=np.float64)
+    return room_ids, room_numbers, capacities
+
+
+def load_intervals(conn, start_date=None, end_date=None, exclude_email=None):
+    """
+    Load booking intervals as int64 columns:
+    room_id, day number (Julian day, Monday == 0 mod 7), start minute, end minute.
+    Bookings made under exclude_email (staff blocks) are skipped.
+
+    Time parsing is done by SQLite so no per-row Python work happens here.
+    """
+    sql = """
+        SELECT room_id,
+               CAST(julianday(date) + 0.5 AS INTEGER),
+               CAST(substr(start_time, 1, 2) AS INTEGER) * 60
+                 + CAST(substr(start_time, 4, 2) AS INTEGER),
+               CAST(substr(end_time, 1, 2) AS INTEGER) * 60
+                 + CAST(substr(end_time, 4, 2) AS INTEGER)
+        FROM bookings
+    """
+    where = []
+    params = []
+    if start_date:
+        where.append("date >= ?")
+        params.append(start_date)
+    if end_date:
+        where.append("date <= ?")
+        params.append(end_date)
+    if exclude_email:
+        where.append("email != ?")
+        params.append(exclude_email)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+
+    cur = conn.execute(sql, params)
+    chunks = []
+    while True:
+        rows = cur.fetchmany(FETCH_CHUNK)
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=np.int64))
+
+    if not chunks:
+        return np.empty((0, 4), dtype=np.int64)
+    return np.concatenate(chunks)
+
+
+# CORE COMPUTATIONS
+def _minute_coverage(keys, n_keys, starts, ends):
+    """
+    Occupied minutes per key as an (n_keys, 1440) array, built with a
+    difference array + cumsum instead of looping over bookings.
+    """
+    width = DAY_MINUTES + 1
+    diff = np.bincount(keys * width + starts, minlength=n_keys * width)
+    diff -= np.bincount(keys * width + ends, minlength=n_keys * width)
+    return np.cumsum(diff.reshape(n_keys, width), axis=1)[:, :DAY_MINUTES]
+
+
+def _to_slots(minutes):
+    """
+    Collapse the last (minute) axis into 15-minute slot fractions.
+    """
+    shape = minutes.shape[:-1] + (SLOTS_PER_DAY, SLOT_MINUTES)
+    return minutes.reshape(shape).mean(axis=-1)
+
+
+def _weekday_counts(first_day, last_day):
+    """
+    How many times each weekday occurs between two Julian day numbers.
+    Closed form, so a wide requested range costs nothing.
+    """
+    n_days = int(last_day - first_day + 1)
+    counts = np.full(7, n_days // 7, dtype=np.int64)
+    counts[(first_day + np.arange(n_days % 7)) % 7] += 1
+    return counts
+
+
+def julian_day(iso_date):
+    """
+    'YYYY-MM-DD' -> Julian day number, same numbering as load_intervals.
+    Raises ValueError on anything else.
+    """
+    return datetime.strptime(iso_date, "%Y-%m-%d").toordinal() + 1721425
+
+
+def compute_heatmap(conn, start_date=None, end_date=None, exclude_email=None):
+    """
+    Build the utilization heatmap for the given date range, leaving out
+    bookings made under exclude_email.
+
+    Returns a dict of NumPy arrays:
+      utilization  rooms x 7 x 96, fraction of each slot booked on average
+      peak_demand  7 x 96, most rooms in use at once on any single day
+      mean_demand  7 x 96, average rooms in use
+      occupancy    7 x 96, capacity-weighted share of seats booked
+
+    Raises ValueError if a date isn't 'YYYY-MM-DD' or the range is backwards.
+    """
+    range_first = julian_day(start_date) if start_date else None
+    range_last = julian_day(end_date) if end_date else None
+    if range_first and range_last and range_last < range_first:
+        raise ValueError("end date before start date")
+
+    room_ids, room_numbers, capacities = load_rooms(conn)
+    data = load_intervals(conn, start_date, end_date, exclude_email)
+    n_rooms = len(room_ids)
+
+    result = {
+        "rooms": room_numbers,
+        "capacities": capacities,
+        "utilization": np.zeros((n_rooms, 7, SLOTS_PER_DAY)),
+        "peak_demand": np.zeros((7, SLOTS_PER_DAY)),
+        "mean_demand": np.zeros((7, SLOTS_PER_DAY)),
+        "occupancy": np.zeros((7, SLOTS_PER_DAY)),
+        "bookings": 0,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+
+    if n_rooms == 0 or len(data) == 0:
+        return result
+
+    # Drop bookings for rooms that no longer exist and malformed intervals
+    room_idx = np.searchsorted(room_ids, data[:, 0])
+    room_idx = np.clip(room_idx, 0, n_rooms - 1)
+    starts = np.clip(data[:, 2], 0, DAY_MINUTES)
+    ends = np.clip(data[:, 3], 0, DAY_MINUTES)
+    keep = (room_ids[room_idx] == data[:, 0]) & (ends > starts)
+
+    room_idx = room_idx[keep]
+    days = data[keep, 1]
+    starts = starts[keep]
+    ends = ends[keep]
+    result["bookings"] = int(keep.sum())
+
+    if len(days) == 0:
+        return result
+
+    # Averages are over the whole requested range, booked days or not
+    first_day = days.min()
+    last_day = days.max()
+    if range_first:
+        first_day = min(first_day, range_first)
+    if range_last:
+        last_day = max(last_day, range_last)
+
+    weekdays = days % 7
+    per_weekday = np.maximum(_weekday_counts(first_day, last_day), 1)
+
+    # rooms x weekday x slot
+    coverage = _minute_coverage(room_idx * 7 + weekdays, n_rooms * 7, starts, ends)
+    slots = _to_slots(coverage.reshape(n_rooms, 7, DAY_MINUTES))
+    utilization = slots / per_weekday[None, :, None]
+
+    # day x slot: rooms in use at once, then the worst day per weekday.
+    # Only days that have bookings can set a peak, so the day axis is the
+    # distinct booked days rather than every day in the range.
+    booked_days, day_offset = np.unique(days, return_inverse=True)
+    n_days = len(booked_days)
+    concurrent = _to_slots(_minute_coverage(day_offset, n_days, starts, ends))
+    day_weekday = booked_days % 7
+    peak = np.zeros((7, SLOTS_PER_DAY))
+    np.maximum.at(peak, day_weekday, concurrent)
+
+    total_capacity = capacities.sum()
+    if total_capacity > 0:
+        occupancy = np.tensordot(capacities, utilization, axes=1) / total_capacity
+    else:
+        occupancy = np.zeros((7, SLOTS_PER_DAY))
+
+    result["utilization"] = utilization
+    result["peak_demand"] = peak
+    result["mean_demand"] = utilization.sum(axis=0)
+    result["occupancy"] = occupancy
+    return result
+
+
+# OUTPUT
+def slot_labels():
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, DAY_MINUTES, SLOT_MINUTES)]
+
+
+def heatmap_to_json(result):
+    """
+    Plain dict ready for jsonify().
+    """
+    return {
+        "start_date": result["start_date"],
+        "end_date": result["end_date"],
+        "bookings": result["bookings"],
+        "slot_minutes": SLOT_MINUTES,
+        "slots": slot_labels(),
+        "weekdays": WEEKDAYS,
+        "rooms": [
+            {
+                "room_number": number,
+                "capacity": int(capacity),
+                "utilization": np.round(result["utilization"][i], 4).tolist()
+            }
+            for i, (number, capacity) in enumerate(zip(result["rooms"], result["capacities"]))
+        ],
+        "peak_demand": np.round(result["peak_demand"], 4).tolist(),
+        "mean_demand": np.round(result["mean_demand"], 4).tolist(),
+        "occupancy": np.round(result["occupancy"], 4).tolist(),
+    }
+
+
+def heatmap_to_csv(result):
+    """
+    Long-format CSV: one line per room, weekday and slot.
+    """
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["room_number", "capacity", "weekday", "slot", "utilization"])
+
+    labels = slot_labels()
+    for i, (number, capacity) in enumerate(zip(result["rooms"], result["capacities"])):
+        matrix = np.round(result["utilization"][i], 4)
+        for wd, day_name in enumerate(WEEKDAYS):
+            for slot, label in enumerate(labels):
+                writer.writerow([number, int(capacity), day_name, label, matrix[wd, slot]])
+
+    return out.getvalue()
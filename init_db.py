@@ -1,16 +1,45 @@
+import secrets
 import sqlite3
+import sys
 
-def init_db():
-    conn = sqlite3.connect("rooms.db")
+ROOMS_DB = "rooms.db"
+
+
+def new_feed_generation(conn):
+    """
+    Give the database a fresh feed generation token. Called by restores,
+    which roll feed_versions back to the snapshot's counters: a new token
+    keeps the old ETags and cached feeds from matching again.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS feed_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            token TEXT NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR REPLACE INTO feed_generation (id, token) VALUES (1, ?)",
+                 (secrets.token_hex(8),))
+
+
+def init_db(path=ROOMS_DB, reset=False):
+    """
+    Create the schema if it is missing. Existing data is kept unless
+    reset=True (python init_db.py --reset), which drops both tables first.
+    """
+    conn = sqlite3.connect(path)
     cursor = conn.cursor()
 
-    # Reset tables during development
-    cursor.execute("DROP TABLE IF EXISTS bookings")
-    cursor.execute("DROP TABLE IF EXISTS rooms")
+    # WAL lets readers (including online backups) run alongside the writer
+    cursor.execute("PRAGMA journal_mode=WAL")
+
+    if reset:
+        cursor.execute("DROP TABLE IF EXISTS waitlist")
+        cursor.execute("DROP TABLE IF EXISTS bookings")
+        cursor.execute("DROP TABLE IF EXISTS rooms")
 
     # Create rooms table
     cursor.execute("""
-        CREATE TABLE rooms (
+        CREATE TABLE IF NOT EXISTS rooms (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             room_number TEXT NOT NULL,
             capacity INTEGER NOT NULL,
@@ -21,18 +50,108 @@ def init_db():
 
     # Create bookings table
     cursor.execute("""
-        CREATE TABLE bookings (
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL,
+            room_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            FOREIGN KEY (room_id) REFERENCES rooms(id)
+        )
+    """)
+
+    # Every per-room lookup (conflict checks, day and range schedules)
+    # filters on room + date and orders by start time
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_bookings_room_date
+        ON bookings (room_id, date, start_time)
+    """)
+    # Day-wide counts and the dashboard's recent bookings
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_bookings_date
+        ON bookings (date, start_time)
+    """)
+    # A user's history and calendar feed
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_bookings_email
+        ON bookings (email, date)
+    """)
+
+    # Create waitlist table, looked up by room + date on every cancellation
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS waitlist (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             email TEXT NOT NULL,
             room_id INTEGER NOT NULL,
             date TEXT NOT NULL,
             start_time TEXT NOT NULL,
             end_time TEXT NOT NULL,
+            created_at TEXT NOT NULL,
             FOREIGN KEY (room_id) REFERENCES rooms(id)
         )
     """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_waitlist_room_date
+        ON waitlist (room_id, date, id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_waitlist_date
+        ON waitlist (date)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_waitlist_email
+        ON waitlist (email, date)
+    """)
+
+    # Feed versions for the .ics endpoints, bumped by triggers on every
+    # booking change so any writer (app, bulk tools) invalidates cached
+    # calendar feeds. A restore rolls these back, so feeds are also keyed
+    # by a per-database generation token that restores replace.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feed_versions (
+            key TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    for name, event, rows in (("insert", "INSERT", ["NEW"]),
+                              ("delete", "DELETE", ["OLD"]),
+                              ("update", "UPDATE", ["OLD", "NEW"])):
+        keys = ", ".join(f"('room:' || {r}.room_id, 1), ('email:' || {r}.email, 1)" for r in rows)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS bookings_feed_{name}
+            AFTER {event} ON bookings
+            BEGIN
+                INSERT INTO feed_versions (key, version)
+                VALUES {keys}
+                ON CONFLICT(key) DO UPDATE SET version = version + 1;
+            END
+        """)
+    # Room numbers appear in every user's feed
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS rooms_feed_update
+        AFTER UPDATE OF room_number ON rooms
+        BEGIN
+            INSERT INTO feed_versions (key, version)
+            SELECT DISTINCT 'email:' || email, 1 FROM bookings WHERE room_id = NEW.id
+            ON CONFLICT(key) DO UPDATE SET version = version + 1;
+            INSERT INTO feed_versions (key, version)
+            VALUES ('room:' || NEW.id, 1)
+            ON CONFLICT(key) DO UPDATE SET version = version + 1;
+        END
+    """)
+
+    # A reset reuses booking ids, so it starts a new generation too
+    if reset or not cursor.execute("SELECT name FROM sqlite_master WHERE name='feed_generation'").fetchone():
+        new_feed_generation(conn)
+
+    # Insert sample rooms (only into an empty database)
+    if cursor.execute("SELECT COUNT(*) FROM rooms").fetchone()[0]:
+        conn.commit()
+        conn.close()
+        print("\nDatabase already initialized, existing data kept.\n")
+        return
 
-    # Insert sample rooms
     sample_rooms = [
         ("101", 4, "Study", "Available"),
         ("102", 6, "Study", "Available"),
@@ -52,4 +171,4 @@ def init_db():
 
 
 if __name__ == "__main__":
-    init_db()
+    init_db(reset="--reset" in sys.argv)
@@ -4,8 +4,8 @@ from werkzeug.security import generate_password_hash
 
 STAFF_DB = "staff.db"
 
-def init_staff_db():
-    conn = sqlite3.connect(STAFF_DB)
+def init_staff_db(path=STAFF_DB):
+    conn = sqlite3.connect(path)
     cur = conn.cursor()
 
     cur.execute("DROP TABLE IF EXISTS staff")
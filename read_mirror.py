@@ -0,0 +1,203 @@
+"""
+Optional in-memory read mirror of rooms and current/upcoming bookings.
+
+Enabled with create_app({"READ_MIRROR": True}). At startup the rooms table
+and every booking dated today or later are copied from rooms.db into an
+in-memory SQLite database. Hot read paths (/rooms, /room/<id>, /filter,
+conflict checks, the dashboard's live counts) then query memory instead of
+the file, and every write path refreshes the rows it touched right after
+its commit.
+
+Refreshes are serialized: each one reads disk and replaces the mirrored
+rows under refresh_lock, so a refresh that read disk earlier can never
+land after one that read it later and put an older copy back. Queries
+only take the (short) mirror lock and don't wait on disk reads.
+
+The mirror lives in one process. With several worker processes each one
+only sees its own writes, so run a single process when it is enabled (or
+use check() / the staff mirror-check endpoint to spot drift).
+"""
+import sqlite3
+import threading
+from datetime import datetime
+
+MIRRORED_TABLES = ("rooms", "bookings")
+
+
+class _Result:
+    """
+    Already-fetched rows behind the fetchone()/fetchall() cursor API.
+    """
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+class MirrorConnection:
+    """
+    Drop-in for the sqlite3 connections returned by get_db() on read
+    paths. Queries run under the mirror's lock and are fully fetched.
+    """
+    def __init__(self, mirror):
+        self.mirror = mirror
+
+    def execute(self, sql, params=()):
+        with self.mirror.lock:
+            rows = self.mirror.conn.execute(sql, params).fetchall()
+        return _Result(rows)
+
+    def close(self):
+        pass
+
+
+class ReadMirror:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.since = None
+
+    def _disk(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # LOADING
+    def load(self):
+        """
+        (Re)build the mirror from disk: same table and index definitions,
+        all rooms, bookings from today on.
+        """
+        with self.refresh_lock:
+            since = datetime.now().strftime("%Y-%m-%d")
+            disk = self._disk()
+            try:
+                schema = disk.execute(f"""
+                    SELECT type, name, sql
+                    FROM sqlite_master
+                    WHERE tbl_name IN ({", ".join("?" for _ in MIRRORED_TABLES)})
+                      AND type IN ('table', 'index') AND sql IS NOT NULL
+                    ORDER BY type = 'index'
+                """, MIRRORED_TABLES).fetchall()
+                rooms = disk.execute("SELECT * FROM rooms").fetchall()
+                bookings = disk.execute("SELECT * FROM bookings WHERE date >= ?", (since,)).fetchall()
+            finally:
+                disk.close()
+
+            with self.lock:
+                for table in MIRRORED_TABLES:
+                    self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+                for row in schema:
+                    self.conn.execute(row["sql"])
+                self._insert("rooms", rooms)
+                self._insert("bookings", bookings)
+                self.conn.commit()
+                self.since = since
+
+    def _insert(self, table, rows):
+        if not rows:
+            return
+        columns = rows[0].keys()
+        self.conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})",
+            [tuple(r) for r in rows]
+        )
+
+    def connect(self):
+        return MirrorConnection(self)
+
+    def covers(self, date):
+        """
+        True if bookings on `date` ('YYYY-MM-DD') are in the mirror.
+        """
+        return date >= self.since
+
+    # SYNC (called by write paths after they commit)
+    def refresh_rooms(self):
+        with self.refresh_lock:
+            disk = self._disk()
+            try:
+                rooms = disk.execute("SELECT * FROM rooms").fetchall()
+            finally:
+                disk.close()
+
+            with self.lock:
+                self.conn.execute("DELETE FROM rooms")
+                self._insert("rooms", rooms)
+                self.conn.commit()
+
+    def refresh_bookings(self, room_id, start_date=None, end_date=None):
+        """
+        Re-copy one room's bookings between two dates (inclusive; None
+        means unbounded) from disk.
+        """
+        with self.refresh_lock:
+            start_date = max(start_date or self.since, self.since)
+            where = "room_id=? AND date >= ?"
+            params = [room_id, start_date]
+            if end_date:
+                where += " AND date <= ?"
+                params.append(end_date)
+
+            disk = self._disk()
+            try:
+                rows = disk.execute(f"SELECT * FROM bookings WHERE {where}", params).fetchall()
+            finally:
+                disk.close()
+
+            with self.lock:
+                self.conn.execute(f"DELETE FROM bookings WHERE {where}", params)
+                self._insert("bookings", rows)
+                self.conn.commit()
+
+    # CONSISTENCY
+    def check(self):
+        """
+        Compare the mirror with disk. Returns a dict with per-table row
+        counts and the ids that are missing, extra or different. Runs
+        between refreshes, so a write whose refresh is still pending can
+        show up as drift for that moment.
+        """
+        with self.refresh_lock:
+            since = self.since
+            queries = {
+                "rooms": ("SELECT * FROM rooms", ()),
+                "bookings": ("SELECT * FROM bookings WHERE date >= ?", (since,)),
+            }
+
+            disk = self._disk()
+            try:
+                on_disk = {t: disk.execute(sql, p).fetchall() for t, (sql, p) in queries.items()}
+            finally:
+                disk.close()
+
+            with self.lock:
+                in_memory = {t: self.conn.execute(sql, p).fetchall() for t, (sql, p) in queries.items()}
+
+        report = {"since": since, "consistent": True}
+        for table in MIRRORED_TABLES:
+            disk_rows = {r["id"]: tuple(r) for r in on_disk[table]}
+            mem_rows = {r["id"]: tuple(r) for r in in_memory[table]}
+            missing = sorted(disk_rows.keys() - mem_rows.keys())
+            extra = sorted(mem_rows.keys() - disk_rows.keys())
+            changed = sorted(i for i in disk_rows.keys() & mem_rows.keys()
+                             if disk_rows[i] != mem_rows[i])
+            report[table] = {
+                "disk": len(disk_rows),
+                "mirror": len(mem_rows),
+                "missing": missing,
+                "extra": extra,
+                "changed": changed,
+            }
+            if missing or extra or changed:
+                report["consistent"] = False
+
+        return report